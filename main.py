@@ -3,95 +3,154 @@
 Main entry point for ArXiv RAG MCP Agent
 """
 import asyncio
+import logging
+import signal
 import sys
 from pathlib import Path
 
+from src import http_pool
 from src.config import Config
+from src.logging_setup import setup_logging
 from src.mcp_manager import MCPManager
 from src.phase1_ingestion import IngestionPipeline
 from src.phase2_query import QueryPipeline
 
+log = logging.getLogger(__name__)
+
+def print_token(token: str):
+    """Echo a streamed answer token to the console, in order with the log output"""
+    log.info(token, extra={"end": ""})
+
+async def run_phases(config, mcp_manager):
+    """Connect to the MCP servers and run the configured phases"""
+    # Connect to all MCP servers with overall timeout
+    timeout = mcp_manager.connect_timeout
+    log.info(f"⏳ Connecting to MCP servers (this may take up to {timeout / 60:.0f} minutes)...\n")
+    await asyncio.wait_for(mcp_manager.connect_all(), timeout=timeout)
+    
+    # Phase 1: Ingestion
+    if config.phase in ["ingestion", "both"]:
+        log.info("\n" + "="*60)
+        log.info("📥 PHASE 1: INGESTION PIPELINE")
+        log.info("="*60 + "\n")
+        
+        ingestion = IngestionPipeline(mcp_manager, config)
+        await ingestion.run()
+        
+        log.info("\n" + "="*60)
+        log.info("✅ Phase 1 Complete: Papers ingested into Pinecone")
+        log.info("="*60 + "\n")
+    
+    # Phase 2: Query
+    if config.phase in ["query", "both"]:
+        log.info("\n" + "="*60)
+        log.info("🔍 PHASE 2: QUERY PIPELINE")
+        log.info("="*60 + "\n")
+        
+        query = QueryPipeline(mcp_manager, config)
+        
+        # Example query (can be modified or passed as argument)
+        user_query = config.user_query or "What is special about the interaction between the Higgs boson and the top quark?"
+        
+        log.info(f"Query: {user_query}\n")
+        try:
+            await query.run(user_query, on_token=print_token)
+        finally:
+            # Write out Notion logs still waiting in the background batch
+            await query.aclose()
+        
+        log.info("\n" + "="*60)
+        log.info("✅ Phase 2 Complete")
+        log.info(f"📄 Answer saved to: {query.answer_path}")
+        log.info("="*60 + "\n")
+
+async def run_until_stopped(coro, stop: asyncio.Event):
+    """Run ``coro``, cancelling it as soon as ``stop`` is set"""
+    work = asyncio.create_task(coro)
+    stopper = asyncio.create_task(stop.wait())
+    
+    try:
+        await asyncio.wait({work, stopper}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stopper.cancel()
+    
+    if not work.done():
+        # Let in-flight coroutines unwind through their own cleanup before we tear down
+        work.cancel()
+        await asyncio.gather(work, return_exceptions=True)
+        raise KeyboardInterrupt
+    
+    return work.result()
+
 async def main():
     """Main execution function"""
+    listener = setup_logging()
     config = Config.from_env()
     
-    print("🚀 Starting ArXiv RAG MCP Agent")
-    print(f"Phase: {config.phase}")
-    print(f"Topic: {config.search_topic}")
-    print(f"Max Papers: {config.max_papers}\n")
+    log.info("🚀 Starting ArXiv RAG MCP Agent")
+    log.info(f"Phase: {config.phase}")
+    log.info(f"Topic: {config.search_topic}")
+    log.info(f"Max Papers: {config.max_papers}\n")
     
     # Initialize MCP Manager
     mcp_manager = MCPManager(config)
     
+    # Turn Ctrl+C and `docker stop` into a cancellation of the running work
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    signals = (signal.SIGINT, signal.SIGTERM)
+    
+    def request_stop():
+        # Restore the default handlers, so a second Ctrl+C force-quits a stuck cleanup
+        for sig in signals:
+            loop.remove_signal_handler(sig)
+        stop.set()
+    
     try:
-        # Connect to all MCP servers with overall timeout
-        print("⏳ Connecting to MCP servers (this may take up to 2 minutes)...\n")
-        await asyncio.wait_for(
-            mcp_manager.connect_all(),
-            timeout=120  # 2 minute total timeout
-        )
-        
-        # Phase 1: Ingestion
-        if config.phase in ["ingestion", "both"]:
-            print("\n" + "="*60)
-            print("📥 PHASE 1: INGESTION PIPELINE")
-            print("="*60 + "\n")
-            
-            ingestion = IngestionPipeline(mcp_manager, config)
-            await ingestion.run()
-            
-            print("\n" + "="*60)
-            print("✅ Phase 1 Complete: Papers ingested into Pinecone")
-            print("="*60 + "\n")
-        
-        # Phase 2: Query
-        if config.phase in ["query", "both"]:
-            print("\n" + "="*60)
-            print("🔍 PHASE 2: QUERY PIPELINE")
-            print("="*60 + "\n")
-            
-            query = QueryPipeline(mcp_manager, config)
-            
-            # Example query (can be modified or passed as argument)
-            user_query = config.user_query or "What is special about the interaction between the Higgs boson and the top quark?"
-            
-            print(f"Query: {user_query}\n")
-            answer = await query.run(user_query)
-            
-            print("\n" + "="*60)
-            print("✅ Phase 2 Complete")
-            print(f"📄 Answer saved to: /app/outputs/answer.md")
-            print("="*60 + "\n")
+        for sig in signals:
+            loop.add_signal_handler(sig, request_stop)
+    except NotImplementedError:
+        pass  # Windows event loops: Ctrl+C still arrives as KeyboardInterrupt
+    
+    try:
+        await run_until_stopped(run_phases(config, mcp_manager), stop)
     
     except asyncio.TimeoutError:
-        print("\n❌ Timeout Error: MCP server connection took too long")
+        log.error("\n❌ Timeout Error: MCP server connection took too long")
         sys.exit(1)
     
     except KeyboardInterrupt:
-        print("\n\n⚠️  Interrupted by user (Ctrl+C)")
+        log.warning("\n\n⚠️  Interrupted by user (Ctrl+C / SIGTERM)")
         sys.exit(0)
     
     except Exception as e:
-        print(f"\n❌ Error: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"\n❌ Error: {e}")
         sys.exit(1)
     
     finally:
         # Cleanup
-        print("\n🧹 Cleaning up...")
+        log.info("\n🧹 Cleaning up...")
         try:
             await asyncio.wait_for(
-                mcp_manager.disconnect_all(),
-                timeout=10
+                mcp_manager.disconnect_all(timeout=5),
+                timeout=15
             )
         except asyncio.TimeoutError:
-            print("⚠️  Cleanup timeout - forcing exit")
+            log.warning("⚠️  Cleanup timeout - forcing exit")
         except Exception as e:
-            print(f"⚠️  Cleanup error: {e}")
+            log.warning(f"⚠️  Cleanup error: {e}")
+        await http_pool.aclose()
         
-        print("\n🔒 All connections closed")
-        print("👋 Goodbye!\n")
+        log.info("\n🔒 All connections closed")
+        log.info("👋 Goodbye!\n")
+        listener.stop()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    # uvloop speeds up the subprocess/stdio-heavy scheduling; fall back to asyncio's loop
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+    
+    asyncio.run(main())
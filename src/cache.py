@@ -0,0 +1,87 @@
+"""On-disk cache for expensive but deterministic lookups"""
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+# JSON codec shared across the package: orjson is several times faster on large
+# MCP responses and cache entries, the stdlib is the fallback
+try:
+    import orjson
+    
+    json_dumps = orjson.dumps
+    json_loads = orjson.loads
+except ImportError:
+    import json
+    
+    def json_dumps(value: Any) -> bytes:
+        return json.dumps(value).encode()
+    
+    json_loads = json.loads
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable key for a combination of lookup parameters"""
+    return hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()
+
+
+def read_cached(path: Path, ttl: float) -> Optional[Any]:
+    """Value stored at ``path`` if it is younger than ``ttl`` seconds, else None"""
+    try:
+        if time.time() - path.stat().st_mtime < ttl:
+            return json_loads(path.read_bytes())
+    except (OSError, ValueError):
+        pass  # Missing or corrupt entry - treat as a miss
+    return None
+
+
+def write_cached(path: Path, value: Any):
+    """Store ``value`` at ``path`` atomically, so readers never see a partial file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_bytes(json_dumps(value))
+    os.replace(tmp_path, path)
+
+
+def prune_cache(cache_dir: Path, ttl: float, max_entries: int):
+    """Delete entries older than ``ttl`` seconds, then the oldest beyond ``max_entries``"""
+    now = time.time()
+    fresh = []
+    for path in Path(cache_dir).glob("*.json"):
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            continue  # Removed concurrently
+        if now - mtime >= ttl:
+            path.unlink(missing_ok=True)
+        else:
+            fresh.append((mtime, path))
+    
+    fresh.sort(reverse=True)
+    for _, path in fresh[max_entries:]:
+        path.unlink(missing_ok=True)
+
+
+async def cached_call(
+    cache_dir: Path,
+    key: str,
+    ttl: float,
+    fn: Callable[[], Awaitable[Any]],
+    cache_if: Callable[[Any], bool] = bool
+) -> Any:
+    """Return the cached result of ``fn`` if younger than ``ttl`` seconds
+
+    Otherwise await ``fn()`` and store its result, unless ``cache_if`` rejects
+    it (by default empty results are not cached, so a failed lookup is retried).
+    """
+    path = Path(cache_dir) / f"{key}.json"
+    
+    cached = read_cached(path, ttl)
+    if cached is not None:
+        return cached
+    
+    value = await fn()
+    if cache_if(value):
+        write_cached(path, value)
+    return value
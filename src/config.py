@@ -1,10 +1,11 @@
 """Configuration management"""
+import functools
 import os
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Config:
     """Application configuration"""
     
@@ -25,7 +26,29 @@ class Config:
     max_papers: int
     phase: str  # "ingestion", "query", or "both"
     user_query: Optional[str] = None
-    arxiv_categories: Optional[list] = None  # Leave None for auto-search all categories
+    arxiv_categories: Optional[Tuple[str, ...]] = None  # Leave None for auto-search all categories
+    ingest_concurrency: int = 5  # Papers processed in parallel during ingestion
+    upsert_batch_size: int = 100  # Records per Pinecone upsert call
+    upsert_workers: int = 4  # Concurrent Pinecone upsert calls
+    search_cache_ttl: int = 86400  # Seconds to reuse cached ArXiv search results (0 disables)
+    query_cache_ttl: int = 86400  # Seconds to reuse cached answers to identical queries (0 disables)
+    query_cache_max_entries: int = 1000  # Answers kept in the exact-match cache (oldest dropped first)
+    semantic_cache_threshold: float = 0.95  # Cosine similarity to reuse an answer to a paraphrased query
+    semantic_cache_max_entries: int = 1000  # Answers kept in the semantic cache (oldest dropped first)
+    mcp_timeout: float = 30  # Seconds allowed for each post-answer step (Notion log, file save)
+    cheap_model: str = "gpt-4o-mini"  # Model for query rewriting and first-pass answers
+    strong_model: str = "gpt-4"  # Model answers escalate to when the cheap one is unsure
+    cheap_answer_min_logprob: float = -0.5  # Mean token logprob below which answers escalate
+    context_token_budget: int = 6000  # Max tokens of retrieved context put in the answer prompt
+    rerank: bool = False  # Rerank merged Pinecone matches by embedding similarity to the query
+    notion_batch_size: int = 10  # Max Notion pages written per background flush
+    notion_flush_interval: float = 2.0  # Max seconds a queued Notion log waits for its batch to fill
+    query_rewrites: int = 2  # Extra paraphrases of the query searched alongside it (0 disables)
+    
+    # MCP daemon (keeps servers warm across runs)
+    use_mcp_daemon: bool = False
+    mcp_socket_path: str = "/tmp/arxiv-rag-mcp.sock"
+    mcp_daemon_idle_timeout: int = 3600  # Seconds without clients before the daemon exits (0 = never)
     
     # Paths
     data_dir: Path = Path("/app/data")
@@ -34,21 +57,48 @@ class Config:
     
     @classmethod
     def from_env(cls):
-        """Load configuration from environment variables"""
-        # Parse categories from comma-separated string if provided
-        categories_str = os.getenv("ARXIV_CATEGORIES")
-        categories = categories_str.split(",") if categories_str else None
-        
-        return cls(
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-            pinecone_api_key=os.getenv("PINECONE_API_KEY"),
-            notion_token=os.getenv("NOTION_TOKEN"),
-            pinecone_index_name=os.getenv("PINECONE_INDEX_NAME", "arxiv-papers"),
-            pinecone_environment=os.getenv("PINECONE_ENVIRONMENT", "us-east-1-aws"),
-            notion_database_id=os.getenv("NOTION_DATABASE_ID"),
-            search_topic=os.getenv("SEARCH_TOPIC", "Higgs Boson production in association with a single top quark"),
-            max_papers=int(os.getenv("MAX_PAPERS", "10")),
-            phase=os.getenv("PHASE", "both"),
-            user_query=os.getenv("USER_QUERY"),
-            arxiv_categories=categories
-        )
\ No newline at end of file
+        """Load configuration from environment variables (read once per process)"""
+        return _load_config_cached()
+
+
+@functools.lru_cache(maxsize=1)
+def _load_config_cached() -> Config:
+    """Build the Config from environment variables"""
+    # Parse categories from comma-separated string if provided: strip padding,
+    # drop empties and duplicates (case is kept - ArXiv names like "cs.AI" are case-sensitive)
+    categories_str = os.getenv("ARXIV_CATEGORIES") or ""
+    categories = tuple(sorted({c.strip() for c in categories_str.split(",") if c.strip()})) or None
+    
+    return Config(
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        pinecone_api_key=os.getenv("PINECONE_API_KEY"),
+        notion_token=os.getenv("NOTION_TOKEN"),
+        pinecone_index_name=os.getenv("PINECONE_INDEX_NAME", "arxiv-papers"),
+        pinecone_environment=os.getenv("PINECONE_ENVIRONMENT", "us-east-1-aws"),
+        notion_database_id=os.getenv("NOTION_DATABASE_ID"),
+        search_topic=os.getenv("SEARCH_TOPIC", "Higgs Boson production in association with a single top quark"),
+        max_papers=int(os.getenv("MAX_PAPERS", "10")),
+        phase=os.getenv("PHASE", "both"),
+        user_query=os.getenv("USER_QUERY"),
+        arxiv_categories=categories,
+        ingest_concurrency=int(os.getenv("INGEST_CONCURRENCY", "5")),
+        upsert_batch_size=int(os.getenv("UPSERT_BATCH_SIZE", "100")),
+        upsert_workers=int(os.getenv("UPSERT_WORKERS", "4")),
+        search_cache_ttl=int(os.getenv("SEARCH_CACHE_TTL", "86400")),
+        query_cache_ttl=int(os.getenv("QUERY_CACHE_TTL", "86400")),
+        query_cache_max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1000")),
+        semantic_cache_threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+        semantic_cache_max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000")),
+        mcp_timeout=float(os.getenv("MCP_TIMEOUT", "30")),
+        cheap_model=os.getenv("CHEAP_MODEL", "gpt-4o-mini"),
+        strong_model=os.getenv("STRONG_MODEL", "gpt-4"),
+        cheap_answer_min_logprob=float(os.getenv("CHEAP_ANSWER_MIN_LOGPROB", "-0.5")),
+        context_token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000")),
+        rerank=os.getenv("RERANK", "false").lower() in ("1", "true", "yes"),
+        notion_batch_size=int(os.getenv("NOTION_BATCH_SIZE", "10")),
+        notion_flush_interval=float(os.getenv("NOTION_FLUSH_INTERVAL", "2.0")),
+        query_rewrites=int(os.getenv("QUERY_REWRITES", "2")),
+        use_mcp_daemon=os.getenv("MCP_DAEMON", "false").lower() in ("1", "true", "yes"),
+        mcp_socket_path=os.getenv("MCP_SOCKET_PATH", "/tmp/arxiv-rag-mcp.sock"),
+        mcp_daemon_idle_timeout=int(os.getenv("MCP_DAEMON_IDLE_TIMEOUT", "3600"))
+    )
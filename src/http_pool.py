@@ -0,0 +1,38 @@
+"""Shared HTTP connection pool
+
+Every HTTP-based client in the process (SSE/HTTP MCP transports, API clients)
+should take its ``httpx.AsyncClient`` from here instead of building its own,
+so TCP/TLS connections are kept alive and reused across calls.
+"""
+from typing import Optional
+
+import httpx
+
+# Also passed per request by clients (like OpenAI's) that override the client default
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=3.0)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the process-wide HTTP client, creating it on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=True,  # Multiplexes concurrent requests to one host over a single connection
+            limits=httpx.Limits(
+                max_connections=32,
+                max_keepalive_connections=16,
+                keepalive_expiry=30
+            ),
+            timeout=DEFAULT_TIMEOUT
+        )
+    return _client
+
+
+async def aclose():
+    """Close the shared client and its pooled connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,42 @@
+"""Logging configuration - console output written from a background thread"""
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+
+class _ConsoleHandler(logging.StreamHandler):
+    """StreamHandler whose line ending a record can override with ``extra={"end": ""}``
+    
+    Lets streamed text (e.g. answer tokens) share the log queue, and so stay in
+    order with the log lines around it, without a newline after every piece.
+    """
+    
+    def emit(self, record: logging.LogRecord):
+        # Only the listener thread emits, so switching the terminator is safe
+        self.terminator = getattr(record, "end", "\n")
+        super().emit(record)
+
+
+def setup_logging(level: int = logging.INFO) -> QueueListener:
+    """Route all log records through a queue drained by a listener thread
+
+    Coroutines only enqueue records, so a slow stdout never blocks the event
+    loop. Messages are emitted verbatim (emoji included). Call ``stop()`` on the
+    returned listener before exiting to flush pending records.
+    """
+    log_queue = queue.SimpleQueue()
+    
+    handler = _ConsoleHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = QueueListener(log_queue, handler)
+    
+    # Third-party libraries stay at WARNING; application loggers get `level`
+    root = logging.getLogger()
+    root.handlers[:] = [QueueHandler(log_queue)]
+    root.setLevel(logging.WARNING)
+    for name in ("src", "__main__"):
+        logging.getLogger(name).setLevel(level)
+    
+    listener.start()
+    return listener
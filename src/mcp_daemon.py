@@ -0,0 +1,305 @@
+"""Persistent MCP connection daemon
+
+Keeps the MCP server subprocesses warm between runs and exposes their tools
+over a Unix domain socket, so repeated runs skip the uv/npx cold start.
+MCPManager spawns it on demand when MCP_DAEMON is enabled; it can also be
+started by hand with ``python -m src.mcp_daemon``. It exits after
+MCP_DAEMON_IDLE_TIMEOUT seconds without clients, or on a ``shutdown`` request,
+which a run sends when the daemon serves an outdated server configuration.
+
+Wire protocol: newline-delimited JSON objects carrying an ``id`` so that
+concurrent requests can share one connection.
+"""
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from mcp.types import CallToolResult
+
+log = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 30  # seconds between pings to each server
+STARTUP_TIMEOUT = 90  # seconds to wait for a freshly spawned daemon
+ATTACH_TIMEOUT = STARTUP_TIMEOUT + 30  # seconds for the whole attach, handshakes included
+
+
+def fingerprint(server_configs: Dict[str, Dict]) -> str:
+    """Hash of every server's command, arguments and environment"""
+    payload = json.dumps(server_configs, sort_keys=True, default=str).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+def spawn_daemon(config):
+    """Start a detached daemon process that outlives the current run"""
+    log_file = open(config.logs_dir / "mcp_daemon.log", "ab")
+    subprocess.Popen(
+        [sys.executable, "-m", "src.mcp_daemon"],
+        cwd=Path(__file__).resolve().parent.parent,
+        stdin=subprocess.DEVNULL,
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+        start_new_session=True  # Survive the parent's exit and Ctrl+C
+    )
+    log_file.close()
+
+
+class DaemonClient:
+    """Client for the MCP daemon's Unix socket"""
+    
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+    
+    async def connect(self, wait: float = 0):
+        """Open the socket, retrying for up to ``wait`` seconds"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        while True:
+            try:
+                self._reader, self._writer = await asyncio.open_unix_connection(self.socket_path)
+                break
+            except OSError:
+                if loop.time() >= deadline:
+                    raise
+                await asyncio.sleep(0.5)
+        
+        self._read_task = asyncio.create_task(self._read_loop())
+    
+    async def _read_loop(self):
+        """Dispatch responses to the requests waiting on them"""
+        try:
+            while line := await self._reader.readline():
+                response = json.loads(line)
+                future = self._pending.pop(response.get("id"), None)
+                if future and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionResetError("MCP daemon closed the connection"))
+            self._pending.clear()
+    
+    async def _request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send one request and wait for its response"""
+        if self._writer is None or self._writer.is_closing():
+            raise BrokenPipeError("Not connected to MCP daemon")
+        
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        
+        self._writer.write(json.dumps({"id": request_id, **payload}).encode() + b"\n")
+        await self._writer.drain()
+        response = await future
+        
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["result"]
+    
+    async def request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a request, reconnecting first if the socket has dropped
+        
+        A request is never resent once written: the daemon may already have run
+        it, and tool calls such as upserts or page creation are not idempotent.
+        """
+        if self._writer is None or self._writer.is_closing() or self._read_task.done():
+            await self.close()
+            await self.connect()
+        return await self._request(payload)
+    
+    async def shutdown(self):
+        """Ask the daemon to exit; it stops listening before it replies"""
+        await self.request({"op": "shutdown"})
+    
+    async def fingerprint(self) -> str:
+        """Fingerprint of the server configuration the daemon was started with"""
+        result = await self.request({"op": "hello"})
+        return result["fingerprint"]
+    
+    async def call_tool(self, server_name: str, tool_name: str, arguments: Dict[str, Any] = None):
+        """Call a tool on one of the daemon's MCP servers"""
+        result = await self.request({
+            "op": "call_tool",
+            "server": server_name,
+            "tool": tool_name,
+            "arguments": arguments or {}
+        })
+        return CallToolResult.model_validate(result)
+    
+    async def close(self):
+        """Close the socket (the daemon itself keeps running)"""
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+        if self._read_task is not None:
+            self._read_task.cancel()
+            await asyncio.gather(self._read_task, return_exceptions=True)
+        self._reader = self._writer = self._read_task = None
+
+
+async def heartbeat(manager):
+    """Ping every server periodically and reconnect the ones that stopped answering"""
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        for server_name in list(manager.server_configs):
+            session = manager.sessions.get(server_name)
+            try:
+                if session is None:
+                    raise ConnectionError("session lost")
+                await asyncio.wait_for(session.send_ping(), timeout=10)
+            except Exception as e:
+                log.warning(f"💔 {server_name} missed heartbeat ({str(e)[:50]}), reconnecting...")
+                try:
+                    await manager.reconnect_server(server_name)
+                except Exception as e:
+                    log.warning(f"⚠️  Reconnect to {server_name} failed: {e}")
+
+
+async def _socket_in_use(socket_path: str) -> bool:
+    """Whether a live daemon is accepting connections on ``socket_path``"""
+    try:
+        _, writer = await asyncio.open_unix_connection(socket_path)
+    except OSError:
+        return False  # Missing, or left behind by a daemon that was killed
+    writer.close()
+    return True
+
+
+def _unlink_socket(socket_path: str, inode: int):
+    """Remove the socket file, unless a newer daemon has since bound the path"""
+    try:
+        if os.stat(socket_path).st_ino == inode:
+            os.unlink(socket_path)
+    except OSError:
+        pass
+
+
+async def serve(config):
+    """Connect to all MCP servers and serve their tools until shut down, idle or killed"""
+    from src.mcp_manager import MCPManager
+    
+    socket_path = config.mcp_socket_path
+    if await _socket_in_use(socket_path):
+        log.info(f"🛰️  An MCP daemon is already listening on {socket_path}, exiting")
+        return
+    
+    manager = MCPManager(config)
+    await manager.connect_local()
+    key = fingerprint(manager.server_configs)
+    
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    clients = 0
+    idle_since = loop.time()
+    
+    def stop_listening():
+        # Free the path first, so a replacement daemon can bind it straight away
+        server.close()
+        _unlink_socket(socket_path, inode)
+        stop.set()
+    
+    async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        nonlocal clients, idle_since
+        clients += 1
+        write_lock = asyncio.Lock()
+        in_flight = set()
+        
+        async def respond(request: Dict[str, Any]):
+            response = {"id": request.get("id")}
+            try:
+                op = request.get("op")
+                if op == "hello":
+                    response["result"] = {"fingerprint": key}
+                elif op == "shutdown":
+                    log.info("🛑 Shutdown requested by a client")
+                    stop_listening()
+                    response["result"] = {}
+                elif op == "call_tool":
+                    result = await manager.call_tool(request["server"], request["tool"], request.get("arguments"))
+                    response["result"] = result.model_dump(mode="json")
+                else:
+                    raise ValueError(f"Unknown op: {op}")
+            except Exception as e:
+                response["error"] = str(e)
+            
+            async with write_lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(respond(json.loads(line)))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            for task in in_flight:
+                task.cancel()
+            writer.close()
+            clients -= 1
+            idle_since = loop.time()
+    
+    async def exit_when_idle(timeout: float):
+        while not stop.is_set():
+            await asyncio.sleep(min(timeout, 60))
+            if clients == 0 and loop.time() - idle_since >= timeout:
+                log.info(f"💤 No clients for {timeout:.0f}s, shutting down")
+                stop_listening()
+    
+    # Another daemon may have come up while the servers were connecting
+    if await _socket_in_use(socket_path):
+        log.info(f"🛰️  An MCP daemon is already listening on {socket_path}, exiting")
+        await manager.disconnect_all()
+        return
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)  # Stale socket from a daemon that was killed
+    
+    server = await asyncio.start_unix_server(handle_client, path=socket_path)
+    os.chmod(socket_path, 0o600)
+    inode = os.stat(socket_path).st_ino
+    log.info(f"🛰️  MCP daemon listening on {socket_path}")
+    
+    tasks = [asyncio.create_task(heartbeat(manager))]
+    if config.mcp_daemon_idle_timeout > 0:
+        tasks.append(asyncio.create_task(exit_when_idle(config.mcp_daemon_idle_timeout)))
+    try:
+        await stop.wait()
+    finally:
+        # Not server.wait_closed(): it would wait on clients that are still attached
+        server.close()
+        for task in tasks:
+            task.cancel()
+        await manager.disconnect_all()
+        _unlink_socket(socket_path, inode)
+
+
+if __name__ == "__main__":
+    from src.config import Config
+    from src.logging_setup import setup_logging
+    
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+    
+    listener = setup_logging()
+    try:
+        asyncio.run(serve(Config.from_env()))
+    finally:
+        listener.stop()
@@ -1,47 +1,117 @@
 """MCP Server Connection Manager"""
 import asyncio
-from typing import Dict, Any
+import contextlib
+import logging
+from typing import Dict, Any, List, Optional, Set, Tuple
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
+from src.mcp_daemon import ATTACH_TIMEOUT, DaemonClient, STARTUP_TIMEOUT, fingerprint, spawn_daemon
+
+log = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 240  # seconds; covers the slowest server's retry at double its timeout
+
 class MCPManager:
     """Manages connections to multiple MCP servers"""
     
     def __init__(self, config):
         self.config = config
         self.sessions: Dict[str, ClientSession] = {}
-        self.stdio_contexts: Dict[str, Any] = {}  # Store context managers
+        self.server_tasks: Dict[str, asyncio.Task] = {}  # Tasks owning each connection
+        self._closing = asyncio.Event()
+        self.daemon: Optional[DaemonClient] = None  # Set when reusing a persistent daemon
+        self._in_flight: Set[asyncio.Task] = set()  # Tool calls that may still be draining
         
         # Define MCP server configurations
         self.server_configs = {
             "arxiv": {
                 "command": "uv",
                 "args": ["tool", "run", "arxiv-mcp-server", "--storage-path", str(config.data_dir / "arxiv_papers")],
-                "env": {"ARXIV_STORAGE_PATH": str(config.data_dir / "arxiv_papers")}
+                "env": {"ARXIV_STORAGE_PATH": str(config.data_dir / "arxiv_papers")},
+                "timeout_s": 15
             },
             "pinecone": {
                 "command": "npx",
                 "args": ["-y", "@pinecone-database/mcp"],
-                "env": {"PINECONE_API_KEY": config.pinecone_api_key}
+                "env": {"PINECONE_API_KEY": config.pinecone_api_key},
+                "timeout_s": 60  # npx may need to fetch the package
             },
             "notion": {
                 "command": "npx",
                 "args": ["-y", "@notionhq/notion-mcp-server"],
-                "env": {"NOTION_TOKEN": config.notion_token}
-            },
-            "filesystem": {
-                "command": "mcp-server-filesystem",  # Use installed binary directly
-                "args": [str(config.outputs_dir)],
-                "env": {}
+                "env": {"NOTION_TOKEN": config.notion_token},
+                "timeout_s": 60  # npx may need to fetch the package
             }
         }
     
-    async def connect_server(self, server_name: str):
-        """Connect to a specific MCP server"""
+    async def connect_server(self, server_name: str, out: Optional[List[Tuple[int, str]]] = None):
+        """Connect to a specific MCP server
+
+        Progress is appended to ``out`` as (level, message) pairs when given, so
+        that concurrent connections can replay their output per server; otherwise
+        it is logged directly.
+        """
         server_config = self.server_configs[server_name]
         
-        print(f"  📡 Connecting to {server_name}...", end=" ", flush=True)
+        def report(level: int, status: str):
+            message = f"  📡 Connecting to {server_name}... {status}"
+            if out is None:
+                log.log(level, message)
+            else:
+                out.append((level, message))
+        
+        # Start with the server's own timeout; on failure back off and retry with a
+        # doubled timeout (cold npx/uv caches can blow past the first budget)
+        timeout = server_config.get("timeout_s", 30)
+        max_timeout = timeout * 2
+        attempt = 0
+        
+        while True:
+            try:
+                await self._connect_once(server_name, server_config, timeout)
+                report(logging.INFO, "✅" if attempt == 0 else f"✅ (after {attempt} retry)")
+                return
+            
+            except asyncio.CancelledError:
+                report(logging.WARNING, "❌ (cancelled)")
+                raise
+            except Exception as e:
+                reason = "timeout" if isinstance(e, asyncio.TimeoutError) else str(e)[:50]
+                
+                if timeout >= max_timeout:
+                    report(logging.ERROR, f"❌ ({reason})")
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise TimeoutError(f"Connection to {server_name} timed out after {timeout} seconds")
+                    raise RuntimeError(f"Failed to connect to {server_name}: {e}")
+                
+                attempt += 1
+                delay = 2 ** (attempt - 1)
+                timeout = min(timeout * 2, max_timeout)
+                report(logging.WARNING, f"⚠️  ({reason}), retrying in {delay}s with a {timeout}s timeout")
+                await asyncio.sleep(delay)
+    
+    async def _connect_once(self, server_name: str, server_config: Dict[str, Any], timeout: float):
+        """Make a single connection attempt, bounded by ``timeout`` seconds"""
+        # The stdio transport is entered and exited from a dedicated task, since
+        # its cancel scopes must be unwound by the same task that opened them
+        ready = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(self._serve(server_name, server_config, ready))
+        self.server_tasks[server_name] = task
         
+        try:
+            await asyncio.wait_for(ready, timeout=timeout)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        except Exception:
+            # Make sure the subprocess is gone before any retry spawns a new one
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            raise
+    
+    async def _serve(self, server_name: str, server_config: Dict[str, Any], ready: asyncio.Future):
+        """Hold a server connection open until disconnect_all is called"""
         try:
             # Create server parameters
             server = StdioServerParameters(
@@ -50,65 +120,195 @@ class MCPManager:
                 env=server_config.get("env", {})
             )
             
-            # Create and enter the stdio context
-            stdio_context = stdio_client(server)
-            read_stream, write_stream = await stdio_context.__aenter__()
-            
-            # Store the context for later cleanup
-            self.stdio_contexts[server_name] = stdio_context
-            
-            # Create session
-            session = ClientSession(read_stream, write_stream)
-            
-            # Initialize with timeout
-            await asyncio.wait_for(session.initialize(), timeout=30)
-            
-            # Store session
-            self.sessions[server_name] = session
-            
-            print("✅")
-            
-        except asyncio.TimeoutError:
-            print(f"❌ (timeout)")
-            raise TimeoutError(f"Connection to {server_name} timed out after 30 seconds")
+            # The exit stack unwinds session then transport (LIFO), even if one of them fails
+            async with contextlib.AsyncExitStack() as stack:
+                read_stream, write_stream = await stack.enter_async_context(stdio_client(server))
+                
+                # Entering the session starts its receive loop
+                session = await stack.enter_async_context(ClientSession(read_stream, write_stream))
+                await session.initialize()
+                
+                # Store session
+                self.sessions[server_name] = session
+                stack.callback(self.sessions.pop, server_name, None)
+                if not ready.done():
+                    ready.set_result(None)
+                
+                await self._closing.wait()
+        
         except Exception as e:
-            print(f"❌ ({str(e)[:50]})")
-            raise RuntimeError(f"Failed to connect to {server_name}: {e}")
+            if ready.done():
+                raise
+            ready.set_exception(e)
+    
+    async def reconnect_server(self, server_name: str):
+        """Tear down and re-establish a single server connection"""
+        task = self.server_tasks.pop(server_name, None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await self.connect_server(server_name)
+    
+    @property
+    def connect_timeout(self) -> float:
+        """Overall budget for connect_all, including a daemon attach before any fallback"""
+        return CONNECT_TIMEOUT + (ATTACH_TIMEOUT if self.config.use_mcp_daemon else 0)
     
     async def connect_all(self):
-        """Connect to all MCP servers"""
-        print("🔌 Initializing MCP servers:\n")
+        """Connect to all MCP servers, reusing the persistent daemon if enabled"""
+        if self.config.use_mcp_daemon:
+            try:
+                await asyncio.wait_for(self._attach_daemon(), timeout=ATTACH_TIMEOUT)
+                return
+            except Exception as e:
+                reason = "timeout" if isinstance(e, asyncio.TimeoutError) else e
+                log.warning(f"⚠️  MCP daemon unavailable ({reason}), connecting directly\n")
+        await self.connect_local()
+    
+    async def _attach_daemon(self):
+        """Attach to the MCP daemon, spawning it if missing and replacing it if outdated
+        
+        Any failure, handshake errors included, is raised so that the caller
+        falls back to direct connections.
+        """
+        client = DaemonClient(self.config.mcp_socket_path)
+        expected = fingerprint(self.server_configs)
+        
+        try:
+            try:
+                await client.connect()
+            except OSError:
+                log.info("🚀 Starting persistent MCP daemon (first run only)...")
+            else:
+                if await client.fingerprint() == expected:
+                    self.daemon = client
+                    log.info(f"♻️  Reusing warm MCP servers from daemon at {self.config.mcp_socket_path}\n")
+                    return
+                
+                # Changed keys or server arguments: retire the old daemon and its servers
+                log.info("🔄 MCP daemon runs a different server configuration, replacing it...")
+                await client.shutdown()
+                await client.close()
+            
+            spawn_daemon(self.config)
+            await client.connect(wait=STARTUP_TIMEOUT)
+            if await client.fingerprint() != expected:
+                raise RuntimeError("the new daemon reports a different server configuration")
+        except BaseException:
+            await client.close()
+            raise
+        
+        self.daemon = client
+        log.info(f"♻️  Attached to MCP daemon at {self.config.mcp_socket_path}\n")
+    
+    async def connect_local(self):
+        """Connect to all MCP servers concurrently"""
+        log.info("🔌 Initializing MCP servers:\n")
+        
+        # Buffer each server's output and replay it in declaration order,
+        # so concurrent connections still produce readable logs
+        logs: Dict[str, List[Tuple[int, str]]] = {name: [] for name in self.server_configs}
+        tasks = [
+            asyncio.create_task(self.connect_server(name, out=logs[name]))
+            for name in self.server_configs
+        ]
+        
+        try:
+            # Stop waiting on the remaining servers as soon as one fails
+            _, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in pending:
+                task.cancel()
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            for name in self.server_configs:
+                for level, message in logs[name]:
+                    log.log(level, message)
         
-        # Connect sequentially to avoid overwhelming the system
-        for server_name in self.server_configs.keys():
-            await self.connect_server(server_name)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
         
-        print("\n✅ All MCP servers connected successfully!\n")
+        log.info("\n✅ All MCP servers connected successfully!\n")
     
     async def call_tool(self, server_name: str, tool_name: str, arguments: Dict[str, Any] = None):
-        """Call a tool on a specific MCP server"""
-        session = self.sessions.get(server_name)
-        if not session:
-            raise ValueError(f"Server {server_name} not connected")
+        """Call a tool on a specific MCP server
+        
+        The request itself is shielded, so cancelling the caller (e.g. on Ctrl+C)
+        leaves the response to drain instead of tearing the session mid-message.
+        """
+        if self.daemon is not None:
+            request = self.daemon.call_tool(server_name, tool_name, arguments)
+        else:
+            session = self.sessions.get(server_name)
+            if not session:
+                raise ValueError(f"Server {server_name} not connected")
+            request = session.call_tool(tool_name, arguments=arguments or {})
+        
+        task = asyncio.ensure_future(request)
+        self._in_flight.add(task)
+        task.add_done_callback(self._forget_call)
         
         try:
-            result = await session.call_tool(tool_name, arguments=arguments or {})
+            result = await asyncio.shield(task)
             return result
         except Exception as e:
             raise RuntimeError(f"Error calling {tool_name} on {server_name}: {e}")
     
-    async def disconnect_all(self):
-        """Disconnect from all MCP servers"""
-        print("🔌 Disconnecting from MCP servers:\n")
+    def _forget_call(self, task: asyncio.Task):
+        """Done-callback for shielded calls whose caller may have gone away"""
+        self._in_flight.discard(task)
+        # Retrieve the outcome so abandoned calls don't log "exception never retrieved"
+        if not task.cancelled():
+            task.exception()
+    
+    async def _drain_calls(self, timeout: float = 5):
+        """Give in-flight tool calls a bounded chance to finish"""
+        if self._in_flight:
+            log.info(f"  ⏳ Draining {len(self._in_flight)} in-flight tool calls...")
+            _, pending = await asyncio.wait(set(self._in_flight), timeout=timeout)
+            for task in pending:
+                task.cancel()
+    
+    async def disconnect_all(self, timeout: float = 5):
+        """Disconnect from all MCP servers, allowing each up to ``timeout`` seconds"""
+        await self._drain_calls(timeout)
         
-        for server_name, stdio_context in self.stdio_contexts.items():
-            try:
-                print(f"  📡 Disconnecting from {server_name}...", end=" ", flush=True)
-                await stdio_context.__aexit__(None, None, None)
-                print("✅")
-            except Exception as e:
-                print(f"⚠️ (error: {str(e)[:30]})")
+        if self.daemon is not None:
+            # Only drop our socket; the daemon keeps the servers warm for the next run
+            log.info("🔌 Detaching from MCP daemon\n")
+            await self.daemon.close()
+            self.daemon = None
+            return
+        
+        log.info("🔌 Disconnecting from MCP servers:\n")
+        
+        # All servers shut down in parallel under a shared time budget
+        self._closing.set()
+        tasks = list(self.server_tasks.values())
+        pending = set()
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+        
+        for server_name, task in self.server_tasks.items():
+            message = f"  📡 Disconnecting from {server_name}..."
+            if task in pending:
+                task.cancel()
+                log.warning(f"{message} ⚠️ (timeout)")
+            elif task.cancelled():
+                log.info(f"{message} ✅ (cancelled)")
+            elif task.exception() is not None:
+                log.warning(f"{message} ⚠️ (error: {str(task.exception())[:30]})")
+            else:
+                log.info(f"{message} ✅")
+        
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
         
         self.sessions.clear()
-        self.stdio_contexts.clear()
-        print()
\ No newline at end of file
+        self.server_tasks.clear()
+        self._closing.clear()
+        log.info("")
@@ -1,6 +1,40 @@
 """Phase 1: Ingestion Pipeline - Search ArXiv, download, and store in Pinecone"""
+import asyncio
+import itertools
 import json
-from typing import List, Dict
+import logging
+import re
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set
+
+import xxhash
+
+from src.cache import cache_key, cached_call, json_loads
+
+log = logging.getLogger(__name__)
+
+# Blank lines separate paragraphs (and most section headings) in extracted paper text
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+@dataclass(slots=True)
+class ChunkBatch:
+    """Chunks and their metadata as parallel columns (one entry per chunk)"""
+    
+    ids: List[str] = field(default_factory=list)
+    texts: List[str] = field(default_factory=list)
+    paper_ids: List[str] = field(default_factory=list)
+    titles: List[str] = field(default_factory=list)
+    authors: List[List[str]] = field(default_factory=list)
+    chunk_indices: array = field(default_factory=lambda: array("I"))
+    
+    def __len__(self) -> int:
+        return len(self.texts)
+
+def _is_not_found(error: Exception) -> bool:
+    """Whether a Pinecone error means the index doesn't exist"""
+    message = str(error).lower()
+    return "not found" in message or "not_found" in message or "404" in message
 
 class IngestionPipeline:
     """Handles the ingestion of ArXiv papers into Pinecone"""
@@ -8,52 +42,118 @@ class IngestionPipeline:
     def __init__(self, mcp_manager, config):
         self.mcp = mcp_manager
         self.config = config
+        self._seen: Set[int] = set()  # Hashes of chunk texts already queued this run
     
     async def run(self):
-        """Execute the full ingestion pipeline"""
+        """Execute the full ingestion pipeline
+        
+        Papers stream through three stages connected by queues (paper metadata →
+        download + chunk → Pinecone upsert), so Pinecone embeds one paper's chunks
+        while the next papers are still downloading.
+        """
         
         # Step 1: Search ArXiv papers
-        print(f"🔍 Searching ArXiv for: {self.config.search_topic}")
+        log.info(f"🔍 Searching ArXiv for: {self.config.search_topic}")
         papers = await self.search_arxiv()
-        print(f"   Found {len(papers)} papers\n")
+        log.info(f"   Found {len(papers)} papers\n")
         
         if not papers:
-            print("⚠️  No papers found. Exiting ingestion phase.")
+            log.warning("⚠️  No papers found. Exiting ingestion phase.")
             return
         
-        # Step 2: Download and process papers
-        all_chunks = []
+        # Step 2: Create Pinecone index if needed, before chunks start flowing into it
+        log.info("🗄️  Checking Pinecone index...")
+        await self.ensure_pinecone_index()
+        
+        # Step 3: Download, chunk and upsert papers as a streaming pipeline
         papers_to_process = papers[:self.config.max_papers]
+        total = len(papers_to_process)
+        titles = [(paper.get("title") or "Unknown")[:60] for paper in papers_to_process]  # Display only
+        n_processors = self.config.ingest_concurrency
+        n_upserters = self.config.upsert_workers
         
-        for i, paper in enumerate(papers_to_process, 1):
-            print(f"📄 Processing paper {i}/{len(papers_to_process)}")
-            print(f"   Title: {paper.get('title', 'Unknown')[:60]}...")
-            
-            try:
-                chunks = await self.process_paper(paper)
-                all_chunks.extend(chunks)
-                print(f"   ✅ Created {len(chunks)} chunks\n")
-            except Exception as e:
-                print(f"   ⚠️  Error processing paper: {e}\n")
-                continue
+        paper_q: asyncio.Queue = asyncio.Queue(maxsize=n_processors)
+        batch_q: asyncio.Queue = asyncio.Queue(maxsize=n_upserters)
+        stats = {"chunks": 0, "records": 0, "batches": 0}
+        download_slots = asyncio.Semaphore(n_processors)
         
-        print(f"✂️  Total chunks created: {len(all_chunks)}\n")
+        log.info(f"\n🚚 Streaming {total} papers through download → chunk → upsert...\n")
         
-        if not all_chunks:
-            print("⚠️  No chunks created. Exiting ingestion phase.")
-            return
+        async def download(paper_id: str):
+            # Prefetches run ahead of the processors, so cap them at the same concurrency
+            async with download_slots:
+                return await self._download_paper(paper_id)
         
-        # Step 3: Create Pinecone index if needed
-        print("🗄️  Checking Pinecone index...")
-        await self.ensure_pinecone_index()
+        async def producer():
+            for i, paper in enumerate(papers_to_process, 1):
+                # Start the download now so it runs while the paper waits in the queue
+                paper_id = self._paper_id(paper)
+                download_task = tg.create_task(download(paper_id)) if paper_id else None
+                await paper_q.put((i, paper, download_task))
+            for _ in range(n_processors):
+                await paper_q.put(None)
+        
+        async def processor():
+            while (item := await paper_q.get()) is not None:
+                i, paper, download = item
+                log.info(f"📄 Processing paper {i}/{total}: {titles[i - 1]}...")
+                
+                try:
+                    chunks = await self.process_paper(paper, download)
+                except Exception as e:
+                    log.warning(f"   ⚠️  Error processing paper {i}/{total}: {e}")
+                    continue
+                
+                log.info(f"   ✅ Paper {i}/{total}: created {len(chunks)} chunks")
+                stats["chunks"] += len(chunks)
+                
+                records = self._to_records(chunks)
+                while batch := list(itertools.islice(records, self.config.upsert_batch_size)):
+                    await batch_q.put(batch)
+        
+        async def upserter():
+            while (batch := await batch_q.get()) is not None:
+                await self.upsert_to_pinecone(batch)
+                stats["records"] += len(batch)
+                stats["batches"] += 1
+        
+        async def close_batches(processors):
+            # Upserters stop once every processor has drained the paper queue
+            await asyncio.gather(*processors)
+            for _ in range(n_upserters):
+                await batch_q.put(None)
         
-        # Step 4: Upsert chunks to Pinecone
-        print(f"\n💾 Upserting {len(all_chunks)} chunks to Pinecone...")
-        await self.upsert_to_pinecone(all_chunks)
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(producer())
+                processors = [tg.create_task(processor()) for _ in range(n_processors)]
+                for _ in range(n_upserters):
+                    tg.create_task(upserter())
+                tg.create_task(close_batches(processors))
+        except ExceptionGroup as eg:
+            # Report the stage's own error (e.g. a failed upsert), not the group wrapping it
+            raise eg.exceptions[0] from None
+        
+        log.info(f"\n✂️  Total chunks created: {stats['chunks']}")
         
-        print("✅ Ingestion pipeline complete!\n")
+        if not stats["chunks"]:
+            log.warning("⚠️  No chunks created. Nothing was upserted.")
+            return
+        
+        log.info(f"💾 Upserted {stats['records']} records to Pinecone in {stats['batches']} batches")
+        log.info("✅ Ingestion pipeline complete!\n")
     
     async def search_arxiv(self) -> List[Dict]:
+        """Search ArXiv, reusing results cached on disk for the same search settings"""
+        key = cache_key(self.config.search_topic, self.config.max_papers, self.config.arxiv_categories)
+        return await cached_call(
+            self.config.data_dir / "cache",
+            key,
+            self.config.search_cache_ttl,
+            self._search_arxiv
+        )
+    
+    async def _search_arxiv(self) -> List[Dict]:
         """Search ArXiv using MCP server"""
         # Build search arguments
         search_args = {
@@ -63,7 +163,7 @@ class IngestionPipeline:
         
         # Only add categories if explicitly configured
         if self.config.arxiv_categories:
-            search_args["categories"] = self.config.arxiv_categories
+            search_args["categories"] = list(self.config.arxiv_categories)
         
         result = await self.mcp.call_tool(
             "arxiv",
@@ -77,7 +177,7 @@ class IngestionPipeline:
             if hasattr(result, 'content') and result.content:
                 # Try to parse as JSON
                 content_text = result.content[0].text if isinstance(result.content, list) else str(result.content)
-                papers = json.loads(content_text) if isinstance(content_text, str) else content_text
+                papers = json_loads(content_text) if isinstance(content_text, str) else content_text
             else:
                 papers = []
         except (json.JSONDecodeError, AttributeError, IndexError):
@@ -85,14 +185,13 @@ class IngestionPipeline:
         
         return papers if isinstance(papers, list) else []
     
-    async def process_paper(self, paper: Dict) -> List[Dict]:
-        """Download paper and extract text using ArXiv MCP"""
-        
-        paper_id = paper.get("id") or paper.get("entry_id")
-        if not paper_id:
-            raise ValueError("Paper has no ID")
-        
-        # Download the paper using ArXiv MCP
+    @staticmethod
+    def _paper_id(paper: Dict) -> Optional[str]:
+        """ArXiv ID of a search result"""
+        return paper.get("id") or paper.get("entry_id")
+    
+    async def _download_paper(self, paper_id: str):
+        """Download a paper using ArXiv MCP (failures are only warnings)"""
         try:
             await self.mcp.call_tool(
                 "arxiv",
@@ -100,7 +199,21 @@ class IngestionPipeline:
                 {"paper_id": paper_id}
             )
         except Exception as e:
-            print(f"      Download warning: {e}")
+            log.warning(f"      Download warning: {e}")
+    
+    async def process_paper(self, paper: Dict, download: Optional[asyncio.Task] = None) -> ChunkBatch:
+        """Download paper and extract text using ArXiv MCP
+        
+        ``download`` is an already-started download of this paper (prefetched
+        while it was queued); without one the download happens here.
+        """
+        
+        paper_id = self._paper_id(paper)
+        if not paper_id:
+            raise ValueError("Paper has no ID")
+        
+        # Download the paper using ArXiv MCP
+        await (download if download is not None else self._download_paper(paper_id))
         
         # Read the paper content using ArXiv MCP
         result = await self.mcp.call_tool(
@@ -110,57 +223,120 @@ class IngestionPipeline:
         )
         
         # Extract text content
-        paper_text = ""
-        if hasattr(result, 'content') and result.content:
-            paper_text = result.content[0].text if isinstance(result.content, list) else str(result.content)
+        paper_text = self._result_text(result)
         
         if not paper_text:
             raise ValueError("No text content extracted from paper")
         
-        # Chunk the text (simple chunking - 1000 char chunks with 200 overlap)
+        # Chunk the text on paragraph boundaries (up to 1000 chars, ~200 chars overlap)
         chunks = self._chunk_text(paper_text, chunk_size=1000, overlap=200)
         
-        # Add metadata to each chunk
-        enriched_chunks = []
+        # Skip chunks whose text was already seen (shared boilerplate across papers),
+        # saving an embedding and a write for each duplicate
+        ids, texts, indices = [], [], array("I")
         for i, chunk in enumerate(chunks):
-            enriched_chunks.append({
-                "text": chunk,
-                "metadata": {
-                    "paper_id": paper_id,
-                    "title": paper.get("title", "Unknown"),
-                    "authors": paper.get("authors", []),
-                    "chunk_index": i
-                }
-            })
+            digest = xxhash.xxh3_64_intdigest(chunk.encode())
+            if digest in self._seen:
+                continue
+            self._seen.add(digest)
+            # IDs derive from the text alone, so a chunk shared by several papers gets
+            # the same ID whichever paper's processor reaches it first; re-runs stay idempotent
+            ids.append(f"{digest:016x}")
+            texts.append(chunk)
+            indices.append(i)
         
-        return enriched_chunks
+        # Metadata is stored column-wise alongside the texts instead of one dict per chunk
+        n = len(texts)
+        title = paper.get("title", "Unknown")
+        authors = paper.get("authors", [])
+        return ChunkBatch(
+            ids=ids,
+            texts=texts,
+            paper_ids=[paper_id] * n,
+            titles=[title] * n,
+            authors=[authors] * n,
+            chunk_indices=indices
+        )
     
     def _chunk_text(self, text: str, chunk_size: int, overlap: int) -> List[str]:
-        """Simple text chunking with overlap"""
-        chunks = []
-        start = 0
+        """Pack whole paragraphs into chunks of at most ``chunk_size`` characters
+        
+        Consecutive chunks share their trailing paragraphs, up to ``overlap``
+        characters. Whitespace-only segments are dropped, and paragraphs longer
+        than a chunk fall back to fixed-size windows.
+        """
+        if overlap >= chunk_size:
+            raise ValueError(f"overlap ({overlap}) must be smaller than chunk_size ({chunk_size})")
+        
+        step = chunk_size - overlap
+        chunks: List[str] = []
+        buf: List[str] = []
+        size = 0  # len("\n\n".join(buf))
         
-        while start < len(text):
-            end = start + chunk_size
-            chunks.append(text[start:end])
-            start = end - overlap
+        for para in _PARAGRAPH_BREAK.split(text):
+            para = para.strip()
+            if not para:
+                continue
+            
+            if len(para) > chunk_size:
+                if buf:
+                    chunks.append("\n\n".join(buf))
+                    buf, size = [], 0
+                chunks.extend(para[start:start + chunk_size] for start in range(0, max(len(para) - overlap, 1), step))
+                continue
+            
+            if buf and size + 2 + len(para) > chunk_size:
+                chunks.append("\n\n".join(buf))
+                
+                # Carry the trailing paragraphs that fit in `overlap` into the next chunk
+                carry: List[str] = []
+                carry_size = 0
+                for prev in reversed(buf):
+                    extra = len(prev) + (2 if carry else 0)
+                    if carry_size + extra > overlap:
+                        break
+                    carry.insert(0, prev)
+                    carry_size += extra
+                
+                if carry and carry_size + 2 + len(para) > chunk_size:
+                    carry, carry_size = [], 0
+                buf, size = carry, carry_size
+            
+            size += len(para) + (2 if buf else 0)
+            buf.append(para)
+        
+        if buf:
+            chunks.append("\n\n".join(buf))
         
         return chunks
     
     async def ensure_pinecone_index(self):
         """Create Pinecone index if it doesn't exist"""
+        # A marker file from an earlier run skips the MCP round trip entirely
+        marker = self.config.data_dir / "indices" / f"{self.config.pinecone_index_name}.ok"
+        if marker.exists():
+            log.info(f"   ✅ Index '{self.config.pinecone_index_name}' already exists (cached)")
+            return
+        
         try:
             # Try to get index stats
-            await self.mcp.call_tool(
+            result = await self.mcp.call_tool(
                 "pinecone",
                 "describe-index-stats",
                 {"index_name": self.config.pinecone_index_name}
             )
-            print(f"   ✅ Index '{self.config.pinecone_index_name}' already exists")
+            # Tool-level failures come back as an error result rather than an exception
+            if getattr(result, "isError", False):
+                raise RuntimeError(self._result_text(result))
+            log.info(f"   ✅ Index '{self.config.pinecone_index_name}' already exists")
         
-        except:
+        except Exception as e:
+            # Anything other than a missing index (auth, network, ...) is a real error
+            if not _is_not_found(e):
+                raise
+            
             # Create new index with integrated embedding
-            print(f"   📝 Creating new index: {self.config.pinecone_index_name}")
+            log.info(f"   📝 Creating new index: {self.config.pinecone_index_name}")
             await self.mcp.call_tool(
                 "pinecone",
                 "create-index-for-model",
@@ -171,21 +347,40 @@ class IngestionPipeline:
                     "metric": "cosine"
                 }
             )
-            print(f"   ✅ Index created successfully")
-    
-    async def upsert_to_pinecone(self, chunks: List[Dict]):
-        """Upsert text chunks to Pinecone with automatic embedding"""
-        
-        # Prepare records for upserting
-        records = []
-        for i, chunk in enumerate(chunks):
-            records.append({
-                "id": f"chunk_{i}",
-                "text": chunk["text"],  # Pinecone will auto-embed this
-                "metadata": chunk["metadata"]
-            })
+            log.info(f"   ✅ Index created successfully")
+            # A recreated index gets a new host, so drop the one phase 2 persisted
+            (marker.parent / f"{self.config.pinecone_index_name}.host").unlink(missing_ok=True)
         
-        # Batch upsert (Pinecone handles batching internally)
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        marker.touch()
+    
+    @staticmethod
+    def _result_text(result) -> str:
+        """Text content of an MCP tool result"""
+        if hasattr(result, 'content') and result.content:
+            return result.content[0].text if isinstance(result.content, list) else str(result.content)
+        return ""
+    
+    def _to_records(self, batch: ChunkBatch) -> Iterator[Dict]:
+        """Lazily turn a chunk batch into Pinecone records"""
+        return (
+            {
+                "id": record_id,
+                "text": text,  # Pinecone will auto-embed this
+                "metadata": {
+                    "paper_id": paper_id,
+                    "title": title,
+                    "authors": authors,
+                    "chunk_index": chunk_index
+                }
+            }
+            for record_id, text, paper_id, title, authors, chunk_index in zip(
+                batch.ids, batch.texts, batch.paper_ids, batch.titles, batch.authors, batch.chunk_indices
+            )
+        )
+    
+    async def upsert_to_pinecone(self, records: List[Dict]):
+        """Upsert one batch of records to Pinecone with automatic embedding"""
         await self.mcp.call_tool(
             "pinecone",
             "upsert-records",
@@ -194,5 +389,3 @@ class IngestionPipeline:
                 "records": records
             }
         )
-        
-        print(f"   ✅ Successfully upserted {len(records)} records")
\ No newline at end of file
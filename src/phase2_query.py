@@ -1,8 +1,84 @@
 """Phase 2: Query Pipeline - Retrieve from Pinecone, generate answer, log to Notion"""
+import asyncio
+import hashlib
+import heapq
 import json
-from datetime import datetime
-from typing import List, Dict
+import logging
+import re
+import string
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, List, Dict, Optional, Tuple
+import aiofiles
+import numpy as np
 import openai
+import tiktoken
+
+from src import http_pool
+from src.cache import cache_key, json_loads, prune_cache, read_cached, write_cached
+from src.semantic_cache import SemanticCache
+
+log = logging.getLogger(__name__)
+
+_ANSWER_ERROR_PREFIX = "Error generating answer"
+_NO_CONTEXT_ANSWER = "I couldn't find relevant information in the database to answer your question."
+_INSUFFICIENT_CONTEXT = "insufficient context"  # Marker the prompt asks for; triggers escalation
+EMBEDDING_MODEL = "text-embedding-3-small"
+_MATCH_METADATA_FIELDS = ("title", "chunk_index", "paper_id")
+# Bullet or "1." / "1)" numbering in front of a rewrite, but not digits belonging to it ("13 TeV ...")
+_LIST_MARKER = re.compile(r"^\s*(?:[-*•]\s*|\d+[.)]\s+)")
+
+# Answer prompt: static instructions first and the question last, so consecutive
+# requests share the longest possible cached prompt prefix
+SYSTEM_PROMPT_TEMPLATE = """You are a helpful research assistant that answers questions based on academic papers about $topic.
+
+Use ONLY the context provided by the user to answer the question. Each context passage starts with a "### CHUNK <id>" line and a [Source: <paper title>] header. If the context doesn't contain enough information, say so, starting with "Insufficient context".
+
+Provide a concise, well-cited answer. Include paper titles when referencing information."""
+
+PROMPT_TEMPLATE = """CONTEXT:
+$context
+
+QUESTION: $query"""
+
+
+def _source_order(chunk: Dict) -> Tuple[str, int]:
+    """Sort key placing chunks by paper, then by position within the paper"""
+    metadata = chunk.get('metadata', {})
+    return str(metadata.get('paper_id', '')), int(metadata.get('chunk_index', 0))
+
+
+def _unit(embedding: List[float]) -> np.ndarray:
+    """An embedding as an L2-normalized float32 vector"""
+    vec = np.asarray(embedding, dtype=np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+def _is_insufficient(answer: str) -> bool:
+    """Whether the model declined to answer, opening with the marker the prompt asks for"""
+    return answer.lstrip().lower().startswith(_INSUFFICIENT_CONTEXT)
+
+
+def _truncate_utf16(text: str, limit: int) -> str:
+    """Truncate to at most ``limit`` UTF-16 code units, the unit Notion's limits count in
+    
+    A surrogate pair cut in half is dropped rather than left dangling.
+    """
+    encoded = text.encode('utf-16-le')
+    if len(encoded) <= 2 * limit:
+        return text
+    return encoded[:2 * limit].decode('utf-16-le', errors='ignore')
+
+
+def _project_match(match: Dict) -> Dict:
+    """Reduce a Pinecone match to the fields used for prompting and logging"""
+    metadata = match.get('metadata') or {}
+    return {
+        "id": match.get('id'),
+        "score": match.get('score', 0),
+        "text": match.get('text', ''),
+        "metadata": {field: metadata[field] for field in _MATCH_METADATA_FIELDS if field in metadata}
+    }
+
 
 class QueryPipeline:
     """Handles querying the vector database and generating answers"""
@@ -11,137 +87,525 @@ class QueryPipeline:
         self.mcp = mcp_manager
         self.config = config
         
-        # Initialize OpenAI client for GPT-4
-        openai.api_key = config.openai_api_key
-        self.client = openai.OpenAI()
-    
-    async def run(self, user_query: str) -> str:
-        """Execute the query pipeline"""
+        # Initialize OpenAI client for GPT-4 on the shared connection pool, so
+        # TLS sessions are reused across the embedding/rewrite/answer calls
+        self.client = openai.AsyncOpenAI(
+            api_key=config.openai_api_key,
+            max_retries=2,
+            timeout=http_pool.DEFAULT_TIMEOUT,
+            http_client=http_pool.get_client()
+        )
         
-        print(f"💭 User Query: {user_query}\n")
+        # Index host persisted next to phase 1's index marker, so it is looked up
+        # at most once rather than on every run; "" if this run's lookup failed
+        self._index_host_path = config.data_dir / "indices" / f"{config.pinecone_index_name}.host"
+        try:
+            self._index_host: Optional[str] = self._index_host_path.read_text().strip() or None
+        except OSError:
+            self._index_host = None
         
-        # Step 1: Retrieve relevant chunks from Pinecone
-        print("🔍 Retrieving relevant context from Pinecone...")
-        context_chunks = await self.retrieve_context(user_query)
-        print(f"   ✅ Retrieved {len(context_chunks)} relevant chunks\n")
+        self.chunk_text_cache: Dict[str, str] = {}  # Chunk id -> text, first copy seen this session
+        self._token_counts: Dict[str, int] = {}  # Chunk id -> token count, so each chunk is tokenized once
+        self._chunk_embeddings: Dict[str, np.ndarray] = {}  # Merge key -> unit embedding, for reranking
+        self.answer_path = config.outputs_dir / "answer.md"
         
-        # Step 2: Generate answer using GPT-4
-        print("🤖 Generating answer with GPT-4...")
-        answer = await self.generate_answer(user_query, context_chunks)
-        print(f"   ✅ Answer generated ({len(answer)} chars)\n")
+        # Notion pages are written in batches by a background task (started on first use)
+        self.log_queue: asyncio.Queue = asyncio.Queue()
+        self._notion_flusher: Optional[asyncio.Task] = None
         
-        # Step 3: Log to Notion
-        print("📝 Logging interaction to Notion...")
         try:
-            await self.log_to_notion(user_query, context_chunks, answer)
-            print("   ✅ Logged to Notion\n")
-        except Exception as e:
-            print(f"   ⚠️  Notion logging failed: {e}\n")
+            self._encoding = tiktoken.encoding_for_model(config.strong_model)
+        except KeyError:
+            self._encoding = tiktoken.get_encoding("cl100k_base")
+        
+        # Prompt templates are parsed once; the system message is fixed per topic
+        self._prompt_tmpl = string.Template(PROMPT_TEMPLATE)
+        self._system_msg = {
+            "role": "system",
+            "content": string.Template(SYSTEM_PROMPT_TEMPLATE).substitute(topic=config.search_topic)
+        }
+        
+        # One semantic cache per topic, mirroring the topic in the exact-match key
+        self.semantic_cache = SemanticCache(
+            config.outputs_dir / ".semcache" / cache_key(config.search_topic),
+            threshold=config.semantic_cache_threshold,
+            ttl=config.query_cache_ttl,
+            max_entries=config.semantic_cache_max_entries
+        )
+    
+    async def run(self, user_query: str, on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Execute the query pipeline
+        
+        ``on_token`` is called with each piece of the answer as it streams in
+        (a cached answer arrives as a single piece), then with a final newline
+        if the answer doesn't end in one, before anything else is logged.
+        """
+        
+        log.info(f"💭 User Query: {user_query}\n")
+        
+        # Repeat questions are answered from the exact-match cache, skipping steps 1-2
+        key = hashlib.sha256(f"{self.config.search_topic}|{user_query}".encode()).hexdigest()
+        cache_path = self.config.outputs_dir / ".qcache" / f"{key}.json"
+        cached = read_cached(cache_path, self.config.query_cache_ttl)
+        query_vec = None
+        
+        if cached is not None:
+            log.info("⚡ Cache hit - reusing the stored answer for this query\n")
+        elif self.config.query_cache_ttl > 0 or self.config.rerank:
+            # Paraphrases of earlier questions are answered from the semantic cache,
+            # checked before any Pinecone query or query expansion is sent (the
+            # embedding is only needed for that cache or for reranking)
+            query_vec = await self.embed_query(user_query)
+            if query_vec is not None:
+                cached = self.semantic_cache.lookup(query_vec)
+            if cached is not None:
+                log.info(f"⚡ Semantic cache hit (similarity {cached['similarity']:.3f}) - "
+                         f"reusing the answer to: {cached['query'][:60]}\n")
+        
+        if cached is not None:
+            context_chunks, answer = cached["context"], cached["answer"]
+            if on_token is not None:
+                on_token(answer)
+                self._end_stream(answer, on_token)
+        else:
+            # Step 1: Retrieve relevant chunks from Pinecone
+            log.info("🔍 Retrieving relevant context from Pinecone...")
+            context_chunks = await self.retrieve_context(user_query, query_vec=query_vec)
+            log.info(f"   ✅ Retrieved {len(context_chunks)} relevant chunks\n")
+            
+            # Step 2: Generate answer using GPT-4
+            log.info("🤖 Generating answer...")
+            parts = []
+            async for token in self.generate_answer(user_query, context_chunks):
+                parts.append(token)
+                if on_token is not None:
+                    on_token(token)
+            answer = "".join(parts)
+            if on_token is not None:
+                self._end_stream(answer, on_token)
+            log.info(f"   ✅ Answer generated ({len(answer)} chars)\n")
+            
+            # Only cache real answers, not errors (possibly mid-stream), "nothing found"
+            # (no chunk text made it into the prompt) or the strong model also
+            # reporting insufficient context
+            cacheable = (
+                answer != _NO_CONTEXT_ANSWER
+                and _ANSWER_ERROR_PREFIX not in answer
+                and not _is_insufficient(answer)
+            )
+            if cacheable:
+                write_cached(cache_path, {"answer": answer, "context": context_chunks})
+                prune_cache(cache_path.parent, self.config.query_cache_ttl, self.config.query_cache_max_entries)
+                if query_vec is not None:
+                    self.semantic_cache.add(
+                        query_vec,
+                        {"query": user_query, "answer": answer, "context": context_chunks}
+                    )
+        
+        # One timestamp for every sink, formatted once per representation
+        ts = datetime.now(timezone.utc)
+        ts_iso, ts_human = ts.isoformat(), ts.strftime("%Y-%m-%d %H:%M:%S UTC")
+        
+        # Step 3: Queue the Notion log; the background flusher writes it off the critical path
+        log.info("📝 Queueing interaction for Notion...")
+        await self.log_to_notion(user_query, context_chunks, answer, ts_iso, cache_hit=cached is not None)
         
         # Step 4: Save answer locally
-        print("💾 Saving answer to file...")
-        await self.save_answer(answer)
-        print("   ✅ Saved to /app/outputs/answer.md\n")
+        log.info("💾 Saving answer to file...")
+        await asyncio.wait_for(self.save_answer(answer, ts_human), timeout=self.config.mcp_timeout)
+        log.info(f"   ✅ Saved to {self.answer_path}\n")
         
         return answer
     
-    async def retrieve_context(self, query: str, top_k: int = 5) -> List[Dict]:
-        """Retrieve relevant chunks from Pinecone"""
-        
-        result = await self.mcp.call_tool(
-            "pinecone",
-            "query-index",
-            {
-                "index_name": self.config.pinecone_index_name,
-                "query": query,  # Pinecone will auto-embed this
-                "top_k": top_k,
-                "include_metadata": True
-            }
+    @staticmethod
+    def _end_stream(answer: str, on_token: Callable[[str], None]):
+        """Finish the streamed answer's last line, so later output starts on its own"""
+        if not answer.endswith("\n"):
+            on_token("\n")
+    
+    async def embed_query(self, query: str) -> Optional[np.ndarray]:
+        """L2-normalized embedding of the query, or None if embedding fails"""
+        try:
+            response = await self.client.embeddings.create(model=EMBEDDING_MODEL, input=query)
+        except Exception as e:
+            log.warning(f"   ⚠️  Query embedding failed, skipping semantic cache: {e}")
+            return None
+        
+        return _unit(response.data[0].embedding)
+    
+    async def _expand_query(self, query: str) -> List[str]:
+        """Paraphrases of the query from the cheap model (empty if disabled or on failure)"""
+        n = self.config.query_rewrites
+        if n <= 0:
+            return []
+        
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.config.cheap_model,
+                messages=[
+                    {"role": "system", "content": "You rewrite search queries for an academic paper database."},
+                    {"role": "user", "content": f"Write {n} alternative phrasings of this question, one per line, "
+                                                f"with no numbering or commentary:\n{query}"}
+                ],
+                temperature=0.7,
+                max_tokens=200
+            )
+        except Exception as e:
+            log.warning(f"   ⚠️  Query expansion failed, searching the original query only: {e}")
+            return []
+        
+        lines = (response.choices[0].message.content or "").splitlines()
+        rewrites = [_LIST_MARKER.sub("", line).strip() for line in lines]
+        return [r for r in rewrites if r and r != query][:n]
+    
+    async def retrieve_context(self, query: str, top_k: int = 5, query_vec: Optional[np.ndarray] = None) -> List[Dict]:
+        """Retrieve relevant chunks from Pinecone for the query and its rewrites
+        
+        With reranking enabled and ``query_vec`` given, the merged candidates are
+        reordered by their embedding similarity to the original query.
+        """
+        
+        # The original query goes out straight away, alongside the query expansion,
+        # so the rewrites' searches are the only retrieval waiting on the cheap model
+        original, rewritten = await asyncio.gather(
+            self._query_index(query, top_k, self._index_host or None),
+            self._query_rewrites(query, top_k)
         )
+        results = [original, *rewritten]
+        
+        # Merge by chunk id, keeping each chunk's best score across queries
+        best: Dict[str, Dict] = {}
+        for matches in results:
+            for match in matches:
+                key = match.get("id") or match.get("text")
+                if key not in best or match.get("score", 0) > best[key].get("score", 0):
+                    best[key] = match
+        
+        if self.config.rerank and query_vec is not None and len(best) > top_k:
+            try:
+                return await self._rerank(best, query_vec, top_k)
+            except Exception as e:
+                log.warning(f"   ⚠️  Reranking failed, keeping Pinecone's ranking: {e}")
+        
+        return heapq.nlargest(top_k, best.values(), key=lambda m: m.get("score", 0))
+    
+    async def _query_rewrites(self, query: str, top_k: int) -> List[List[Dict]]:
+        """Matches for each rewrite of the query, searched concurrently"""
+        # The host lookup (first run only) overlaps the cheap model call
+        rewrites, host = await asyncio.gather(self._expand_query(query), self._resolve_index_host())
+        return await asyncio.gather(*(self._query_index(q, top_k, host) for q in rewrites))
+    
+    async def _rerank(self, candidates: Dict[str, Dict], query_vec: np.ndarray, top_k: int) -> List[Dict]:
+        """Top-k candidates by cosine similarity to the query, scored in one matrix product"""
+        candidates = {key: c for key, c in candidates.items() if self._chunk_text(c)}
+        
+        # Embed only candidates not seen before, in a single batched request
+        missing = [key for key in candidates if key not in self._chunk_embeddings]
+        if missing:
+            response = await self.client.embeddings.create(
+                model=EMBEDDING_MODEL,
+                input=[self._chunk_text(candidates[key]) for key in missing]
+            )
+            for key, item in zip(missing, response.data):
+                self._chunk_embeddings[key] = _unit(item.embedding)
+        
+        keys = list(candidates)
+        scores = np.stack([self._chunk_embeddings[key] for key in keys]) @ query_vec
+        top = np.argsort(-scores)[:top_k]
+        return [{**candidates[keys[i]], "score": float(scores[i])} for i in top]
+    
+    async def _resolve_index_host(self) -> Optional[str]:
+        """Index host from describe-index, looked up once and persisted
+        
+        Targeting the index by host spares the server a name lookup on every
+        query. A failed lookup is remembered for this run, and queries fall
+        back to the name.
+        """
+        if self._index_host is None:
+            self._index_host = ""
+            try:
+                result = await self.mcp.call_tool(
+                    "pinecone",
+                    "describe-index",
+                    {"index_name": self.config.pinecone_index_name}
+                )
+                description = json_loads(result.content[0].text)
+                self._index_host = description.get("host") or ""
+            except Exception as e:
+                log.warning(f"   ⚠️  Could not resolve the index host, querying by name: {e}")
+            
+            if self._index_host:
+                try:
+                    self._index_host_path.parent.mkdir(parents=True, exist_ok=True)
+                    self._index_host_path.write_text(self._index_host)
+                except OSError:
+                    pass  # Only costs a lookup on the next run
+        
+        return self._index_host or None
+    
+    def _forget_index_host(self):
+        """Stop using the index host, this run and (via the persisted file) the next"""
+        self._index_host = ""
+        self._index_host_path.unlink(missing_ok=True)
+    
+    async def _query_index(self, query: str, top_k: int, host: Optional[str] = None) -> List[Dict]:
+        """Run a single Pinecone query, by index host if one is given
+        
+        A failed query by host is retried once by name, and the host is
+        forgotten: the index may have been deleted or recreated elsewhere.
+        """
+        
+        arguments = {
+            "index_name": self.config.pinecone_index_name,
+            "query": query,  # Pinecone will auto-embed this
+            "top_k": top_k,
+            "include_metadata": True,
+            "include_values": False  # The vectors themselves are never used
+        }
+        
+        try:
+            result = await self.mcp.call_tool(
+                "pinecone",
+                "query-index",
+                {**arguments, "host": host} if host else arguments
+            )
+            # Tool-level failures come back as an error result rather than an exception
+            if host and getattr(result, "isError", False):
+                raise RuntimeError(result.content[0].text if result.content else "query-index failed")
+        except Exception as e:
+            if not host:
+                raise
+            log.warning(f"   ⚠️  Query by index host failed, retrying by name: {str(e)[:80]}")
+            self._forget_index_host()
+            result = await self.mcp.call_tool("pinecone", "query-index", arguments)
         
         # Parse results
         matches = []
         if hasattr(result, 'content') and result.content:
             try:
                 content_text = result.content[0].text if isinstance(result.content, list) else str(result.content)
-                matches = json.loads(content_text) if isinstance(content_text, str) else []
+                matches = json_loads(content_text) if isinstance(content_text, str) else []
             except (json.JSONDecodeError, AttributeError):
                 matches = []
         
-        return matches if isinstance(matches, list) else []
+        if not isinstance(matches, list):
+            return []
+        # Keep only the fields downstream code reads, so caches and merges stay small
+        return [_project_match(m) for m in matches if isinstance(m, dict)]
     
-    async def generate_answer(self, query: str, context_chunks: List[Dict]) -> str:
-        """Generate answer using GPT-4 with retrieved context"""
+    async def generate_answer(self, query: str, context_chunks: List[Dict]) -> AsyncIterator[str]:
+        """Stream an answer generated from the retrieved context, piece by piece
+        
+        The cheap model answers first; the strong model is only called (and
+        streamed) when that answer looks unreliable.
+        """
         
-        # Format context
-        context_text = "\n\n".join([
-            f"[Source: {c.get('metadata', {}).get('title', 'Unknown')}]\n{c.get('text', '')}"
-            for c in context_chunks
-            if c.get('text')
-        ])
+        # Format context in a stable order (paper, then position in the paper) so the
+        # same retrieved chunks always produce a byte-identical prompt prefix
+        ordered = sorted(self._fit_token_budget(context_chunks), key=_source_order)
+        context_text = "\n\n".join(
+            f"### CHUNK {c.get('id', '')}\n[Source: {(c.get('metadata') or {}).get('title', 'Unknown')}]\n{text}"
+            for c in ordered
+            if (text := self._chunk_text(c))
+        )
         
         if not context_text:
-            return "I couldn't find relevant information in the database to answer your question."
+            yield _NO_CONTEXT_ANSWER
+            return
         
         # Create prompt
-        prompt = f"""You are a helpful AI assistant that answers questions based on academic papers about {self.config.search_topic}.
-
-Use ONLY the context provided below to answer the question. If the context doesn't contain enough information, say so.
-
-CONTEXT:
-{context_text}
-
-QUESTION: {query}
-
-Provide a concise, well-cited answer. Include paper titles when referencing information."""
+        prompt = self._prompt_tmpl.substitute(context=context_text, query=query)
+        messages = [self._system_msg, {"role": "user", "content": prompt}]
+        
+        answer, reason = await self._cheap_answer(messages)
+        if answer is not None:
+            log.info(f"   ✅ Answered by {self.config.cheap_model}")
+            yield answer
+            return
+        log.info(f"   ↗️  Escalating to {self.config.strong_model} ({reason})")
         
-        # Call GPT-4
+        # Call the strong model
+        streamed = False
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a helpful research assistant."},
-                    {"role": "user", "content": prompt}
-                ],
+            stream = await self.client.chat.completions.create(
+                model=self.config.strong_model,
+                messages=messages,
                 temperature=0.3,
-                max_tokens=1000
+                max_tokens=1000,
+                stream=True
             )
             
-            answer = response.choices[0].message.content
-            return answer
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    streamed = True
+                    yield chunk.choices[0].delta.content
         
         except Exception as e:
-            return f"Error generating answer: {e}"
+            # Keep the error apart from any partial answer already streamed
+            separator = "\n\n" if streamed else ""
+            yield f"{separator}{_ANSWER_ERROR_PREFIX}: {e}"
+    
+    async def _cheap_answer(self, messages: List[Dict]) -> Tuple[Optional[str], str]:
+        """The cheap model's answer, or None and the reason to escalate"""
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.config.cheap_model,
+                messages=messages,
+                temperature=0.3,
+                max_tokens=400,
+                logprobs=True,
+                top_logprobs=1
+            )
+        except Exception as e:
+            return None, f"{self.config.cheap_model} failed: {e}"
+        
+        choice = response.choices[0]
+        answer = choice.message.content or ""
+        if not answer.strip():
+            return None, "empty answer"
+        if choice.finish_reason == "length":
+            return None, "answer cut off"
+        if _is_insufficient(answer):
+            return None, _INSUFFICIENT_CONTEXT
+        
+        # Mean token log-probability as the model's confidence in its answer
+        tokens = choice.logprobs.content if choice.logprobs else None
+        if tokens:
+            confidence = sum(t.logprob for t in tokens) / len(tokens)
+            if confidence < self.config.cheap_answer_min_logprob:
+                return None, f"low confidence, mean logprob {confidence:.2f}"
+        
+        return answer, ""
+    
+    def _fit_token_budget(self, context_chunks: List[Dict]) -> List[Dict]:
+        """Best-scoring chunks whose text fits within the context token budget"""
+        budget = self.config.context_token_budget
+        kept, used, dropped = [], 0, 0
+        
+        for chunk in sorted(context_chunks, key=lambda c: c.get('score', 0), reverse=True):
+            text = self._chunk_text(chunk)
+            if not text:
+                continue
+            n_tokens = self._token_count(chunk.get('id'), text)
+            # Skip rather than stop, a shorter lower-ranked chunk may still fit
+            if used + n_tokens > budget:
+                dropped += 1
+                continue
+            kept.append(chunk)
+            used += n_tokens
+        
+        if dropped:
+            log.info(f"   ✂️  Dropped {dropped} chunks to fit the {budget}-token context budget")
+        return kept
+    
+    def _token_count(self, chunk_id: Optional[str], text: str) -> int:
+        """Number of tokens in a chunk's text, cached by chunk id"""
+        if chunk_id is None:
+            return len(self._encoding.encode_ordinary(text))
+        if chunk_id not in self._token_counts:
+            self._token_counts[chunk_id] = len(self._encoding.encode_ordinary(text))
+        return self._token_counts[chunk_id]
     
-    async def log_to_notion(self, query: str, context: List[Dict], answer: str):
-        """Log the interaction to Notion database"""
+    def _chunk_text(self, chunk: Dict) -> str:
+        """Text of a retrieved chunk, reusing the copy cached under its id
+        
+        Chunks retrieved again later in the session are emitted byte-identically,
+        and matches returned without text can still be filled in.
+        """
+        chunk_id, text = chunk.get('id'), chunk.get('text') or ""
+        if not chunk_id:
+            return text
+        if text:
+            return self.chunk_text_cache.setdefault(chunk_id, text)
+        return self.chunk_text_cache.get(chunk_id, "")
+    
+    async def log_to_notion(self, query: str, context: List[Dict], answer: str, ts_iso: str, cache_hit: bool = False):
+        """Queue the interaction for logging to the Notion database"""
         
         # Format context for Notion
-        context_summary = "\n".join([
-            f"- {c.get('metadata', {}).get('title', 'Unknown')} (Chunk {c.get('metadata', {}).get('chunk_index', 0)})"
-            for c in context[:3]  # Top 3 sources
-        ])
-        
-        # Create page in Notion database
-        await self.mcp.call_tool(
-            "notion",
-            "notion_create_page",
-            {
-                "parent": {"database_id": self.config.notion_database_id},
-                "properties": {
-                    "Query": {"title": [{"text": {"content": query}}]},
-                    "Timestamp": {"date": {"start": datetime.utcnow().isoformat()}},
-                    "Answer": {"rich_text": [{"text": {"content": answer[:2000]}}]},  # Notion limit
-                    "Sources": {"rich_text": [{"text": {"content": context_summary}}]}
-                }
+        context_summary = "\n".join(
+            f"- {meta.get('title', 'Unknown')} (Chunk {meta.get('chunk_index', 0)})"
+            for meta in ((c.get('metadata') or {}) for c in context[:3])  # Top 3 sources
+        )
+        if cache_hit:
+            # The database schema has no cache column, so flag it in the sources text
+            context_summary = f"(answer served from cache)\n{context_summary}"
+        
+        # Page for the Notion database, created by the background flusher
+        page = {
+            "parent": {"database_id": self.config.notion_database_id},
+            "properties": {
+                "Query": {"title": [{"text": {"content": query}}]},
+                "Timestamp": {"date": {"start": ts_iso}},
+                "Answer": {"rich_text": [{"text": {"content": _truncate_utf16(answer, 2000)}}]},  # Notion limit
+                "Sources": {"rich_text": [{"text": {"content": context_summary}}]}
             }
+        }
+        
+        if self._notion_flusher is None:
+            self._notion_flusher = asyncio.create_task(self._flush_notion_logs())
+        await self.log_queue.put(page)
+    
+    async def _flush_notion_logs(self):
+        """Write queued Notion pages in batches until a None sentinel arrives
+        
+        A batch is written once it holds ``notion_batch_size`` pages or
+        ``notion_flush_interval`` seconds after its first page, whichever is first.
+        """
+        loop = asyncio.get_running_loop()
+        closing = False
+        
+        while not closing:
+            page = await self.log_queue.get()
+            if page is None:
+                break
+            
+            batch = [page]
+            deadline = loop.time() + self.config.notion_flush_interval
+            while len(batch) < self.config.notion_batch_size:
+                try:
+                    page = await asyncio.wait_for(self.log_queue.get(), timeout=deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+                if page is None:
+                    closing = True
+                    break
+                batch.append(page)
+            
+            await self._write_notion_pages(batch)
+    
+    async def _write_notion_pages(self, pages: List[Dict]):
+        """Create a batch of Notion pages concurrently; failures are only logged"""
+        timeout = self.config.mcp_timeout
+        results = await asyncio.gather(
+            *(
+                asyncio.wait_for(self.mcp.call_tool("notion", "notion_create_page", page), timeout=timeout)
+                for page in pages
+            ),
+            return_exceptions=True
         )
+        
+        # Notion logging is best-effort
+        failures = [r for r in results if isinstance(r, Exception)]
+        if len(failures) < len(pages):
+            log.info(f"   ✅ Logged {len(pages) - len(failures)} interaction(s) to Notion")
+        for error in failures:
+            reason = f"timed out after {timeout}s" if isinstance(error, asyncio.TimeoutError) else error
+            log.warning(f"   ⚠️  Notion logging failed: {reason}")
+    
+    async def aclose(self):
+        """Flush any queued Notion logs and stop the background flusher"""
+        if self._notion_flusher is None:
+            return
+        await self.log_queue.put(None)
+        await self._notion_flusher
+        self._notion_flusher = None
     
-    async def save_answer(self, answer: str):
-        """Save answer to local file using filesystem MCP"""
+    async def save_answer(self, answer: str, ts_human: str):
+        """Save answer to the local outputs directory"""
         
         markdown_content = f"""# Query Results
-**Generated**: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+**Generated**: {ts_human}
 **Topic**: {self.config.search_topic}
 
 ## Answer
@@ -152,11 +616,7 @@ Provide a concise, well-cited answer. Include paper titles when referencing info
 *Generated by ArXiv RAG MCP Agent*
 """
         
-        await self.mcp.call_tool(
-            "filesystem",
-            "write_file",
-            {
-                "path": "answer.md",  # Relative to allowed directory
-                "content": markdown_content
-            }
-        )
\ No newline at end of file
+        # Written directly (off the event loop) rather than via an MCP round trip
+        self.answer_path.parent.mkdir(parents=True, exist_ok=True)
+        async with aiofiles.open(self.answer_path, "w", encoding="utf-8") as f:
+            await f.write(markdown_content)
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""Semantic answer cache - reuse answers to paraphrased questions"""
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.cache import cache_key, json_dumps, json_loads, read_cached, write_cached
+
+
+def _quantize(vec: np.ndarray) -> Tuple[np.ndarray, np.float32]:
+    """Symmetric int8 quantization of one vector, returning codes and scale"""
+    scale = np.float32(np.abs(vec).max() / 127) or np.float32(1)
+    return np.round(vec / scale).astype(np.int8), scale
+
+
+def _replace_bytes(path: Path, data: bytes):
+    """Overwrite ``path`` atomically"""
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+class SemanticCache:
+    """Earlier answers, looked up by cosine similarity of query embeddings
+    
+    Embeddings are kept as one int8 matrix with a float32 scale per row (a
+    quarter of the float32 footprint), so a lookup is a single matrix-vector
+    product. Query vectors must be L2-normalized.
+    
+    Storage is append-only: an add writes the answer to its own file and
+    appends one row to ``vectors.i8`` and one line to ``index.jsonl``. The
+    files are only rewritten when the cache outgrows ``max_entries``, at which
+    point expired and then the oldest entries are dropped. Entries older than
+    ``ttl`` seconds are never served; a ``ttl`` of 0 disables the cache.
+    """
+    
+    def __init__(self, cache_dir: Path, threshold: float, ttl: float, max_entries: int):
+        self.cache_dir = Path(cache_dir)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.vectors: Optional[np.ndarray] = None  # (N, dim) int8, oldest row first
+        self.scales = np.empty(0, dtype=np.float32)  # row i ~= vectors[i] * scales[i]
+        self.timestamps = np.empty(0, dtype=np.float64)  # Insertion time of each row
+        self.index: List[Dict[str, Any]] = []  # Parallel to the rows: key, ts, scale, dim
+        
+        if self.ttl > 0:
+            self._load()
+    
+    @property
+    def _vectors_path(self) -> Path:
+        return self.cache_dir / "vectors.i8"
+    
+    @property
+    def _index_path(self) -> Path:
+        return self.cache_dir / "index.jsonl"
+    
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / "entries" / f"{key}.json"
+    
+    def _load(self):
+        """Load a previously persisted cache, discarding it if inconsistent"""
+        try:
+            lines = self._index_path.read_bytes().splitlines()
+            rows = np.fromfile(self._vectors_path, dtype=np.int8)
+        except OSError:
+            return
+        
+        try:
+            index = [json_loads(line) for line in lines if line.strip()]
+            dim = index[0]["dim"] if index else 0
+        except (ValueError, KeyError):
+            index, dim = [], 0
+        
+        if not index or rows.size < len(index) * dim:
+            self._vectors_path.unlink(missing_ok=True)
+            self._index_path.unlink(missing_ok=True)
+            return
+        
+        self.index = index
+        self.vectors = rows[:len(index) * dim].reshape(len(index), dim)
+        self.scales = np.array([e["scale"] for e in index], dtype=np.float32)
+        self.timestamps = np.array([e["ts"] for e in index], dtype=np.float64)
+        
+        if rows.size > len(index) * dim:
+            self._rewrite()  # Drop a row left behind by an interrupted add
+    
+    def lookup(self, query_vec: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Most similar unexpired entry if it clears the threshold, with its similarity"""
+        if self.ttl <= 0 or not self.index:
+            return None
+        
+        # Exact integer dot products, rescaled to (approximate) cosine similarities
+        q8, q_scale = _quantize(query_vec)
+        sims = np.matmul(self.vectors, q8, dtype=np.int32) * self.scales * q_scale
+        sims[self.timestamps < time.time() - self.ttl] = -np.inf
+        
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            return None
+        
+        entry = read_cached(self._entry_path(self.index[best]["key"]), self.ttl)
+        if entry is None:
+            return None
+        return {**entry, "similarity": float(sims[best])}
+    
+    def add(self, query_vec: np.ndarray, entry: Dict[str, Any]):
+        """Remember an answer, appending it to the persisted cache"""
+        if self.ttl <= 0:
+            return
+        
+        now = time.time()
+        q8, scale = _quantize(query_vec)
+        meta = {"key": cache_key(entry.get("query"), now), "ts": now, "scale": float(scale), "dim": q8.size}
+        
+        # The index line is written last, so it only ever points at complete data
+        write_cached(self._entry_path(meta["key"]), entry)
+        with open(self._vectors_path, "ab") as f:
+            f.write(q8.tobytes())
+        with open(self._index_path, "ab") as f:
+            f.write(json_dumps(meta) + b"\n")
+        
+        self.vectors = q8[np.newaxis, :] if self.vectors is None else np.vstack([self.vectors, q8])
+        self.scales = np.append(self.scales, scale)
+        self.timestamps = np.append(self.timestamps, now)
+        self.index.append(meta)
+        
+        if len(self.index) > self.max_entries:
+            self._compact()
+    
+    def _compact(self):
+        """Drop expired entries, then the oldest, down to three quarters of max_entries
+        
+        Shrinking below the cap spreads the cost of rewriting the files over
+        many later adds instead of paying it on every one.
+        """
+        keep_count = max(self.max_entries * 3 // 4, 1)
+        fresh = np.flatnonzero(self.timestamps >= time.time() - self.ttl)
+        keep = fresh[-keep_count:]
+        
+        kept = set(keep.tolist())
+        for i, meta in enumerate(self.index):
+            if i not in kept:
+                self._entry_path(meta["key"]).unlink(missing_ok=True)
+        
+        self.vectors = self.vectors[keep]
+        self.scales = self.scales[keep]
+        self.timestamps = self.timestamps[keep]
+        self.index = [self.index[i] for i in keep]
+        self._rewrite()
+    
+    def _rewrite(self):
+        """Persist the in-memory rows and index, replacing the files"""
+        _replace_bytes(self._vectors_path, self.vectors.tobytes())
+        _replace_bytes(self._index_path, b"".join(json_dumps(meta) + b"\n" for meta in self.index))
@@ -0,0 +1,8 @@
+#!/bin/sh
+# Pre-populate the npm cache so `npx -y` doesn't download the MCP servers
+# at container startup. Safe to re-run; failures are not fatal.
+
+for pkg in @pinecone-database/mcp @notionhq/notion-mcp-server; do
+    echo "Warming npx cache: $pkg"
+    timeout 120 npx -y "$pkg" --help </dev/null >/dev/null 2>&1 || true
+done